@@ -1,4 +1,9 @@
-from os import environ
+from collections import deque
+from functools import wraps
+from os import environ, makedirs, path, remove
+from datetime import datetime, timezone
+import json
+import threading
 import time
 from flask import Flask, flash, jsonify, redirect, render_template, request, send_file
 import sqlite3
@@ -13,6 +18,84 @@ con = sqlite3.connect('contacts.db', check_same_thread=False)
 cur = con.cursor()
 cur.execute('''CREATE TABLE IF NOT EXISTS contacts(id integer primary key autoincrement, first_name text, last_name text, phone text, email text)''')
 
+# change log fed by triggers, used to build delta archives
+cur.execute('''CREATE TABLE IF NOT EXISTS contact_changes(id integer primary key autoincrement, contact_id integer, op text, changed_at timestamp default current_timestamp)''')
+cur.execute('''CREATE TRIGGER IF NOT EXISTS contacts_log_insert AFTER INSERT ON contacts
+               BEGIN INSERT INTO contact_changes(contact_id, op) VALUES(new.id, 'insert'); END''')
+# recreated so databases with the older unconditional update trigger pick up the column list
+cur.execute('''DROP TRIGGER IF EXISTS contacts_log_update''')
+cur.execute('''CREATE TRIGGER contacts_log_update AFTER UPDATE OF first_name, last_name, phone, email ON contacts
+               BEGIN INSERT INTO contact_changes(contact_id, op) VALUES(new.id, 'update'); END''')
+cur.execute('''CREATE TRIGGER IF NOT EXISTS contacts_log_delete AFTER DELETE ON contacts
+               BEGIN INSERT INTO contact_changes(contact_id, op) VALUES(old.id, 'delete'); END''')
+cur.execute('''CREATE TABLE IF NOT EXISTS archives(id integer primary key autoincrement, kind text, since_change integer, change_id integer, path text, created_at timestamp default current_timestamp)''')
+con.commit()
+
+
+def normalize_phone(phone):
+    """
+    Normalizes a free-form phone number for indexed lookups.
+
+    Args:
+        phone (str): The phone number as typed, e.g. "(555) 123-4".
+
+    Returns:
+        tuple: The digits of the phone number and the same digits reversed, e.g. ("5551234", "4321555").
+    """
+    digits = ''.join(ch for ch in (phone or '') if ch.isdigit())
+    return digits, digits[::-1]
+
+
+def normalize_email(email):
+    """
+    Normalizes an email address for indexed lookups.
+
+    Args:
+        email (str): The email address as typed.
+
+    Returns:
+        tuple: The lowercased email address, its local part and its domain.
+    """
+    email_lower = (email or '').strip().lower()
+    local, _, domain = email_lower.partition('@')
+    return email_lower, local, domain
+
+
+def prefix_range(prefix):
+    """
+    Returns the bounds matching every string starting with a prefix, so the lookup can use an index.
+
+    Args:
+        prefix (str): A non-empty prefix.
+
+    Returns:
+        tuple: The lower (inclusive) and upper (exclusive) bounds.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+# normalized lookup columns, added and backfilled on existing databases
+# (after the change log triggers, whose update trigger ignores these columns)
+cur.execute('''PRAGMA table_info(contacts)''')
+contact_columns = [row[1] for row in cur.fetchall()]
+for lookup_column in ('phone_digits', 'phone_digits_rev', 'email_lower', 'email_local', 'email_domain'):
+    if lookup_column not in contact_columns:
+        cur.execute(f'''ALTER TABLE contacts ADD COLUMN {lookup_column} text''')
+cur.execute('''SELECT id, phone, email FROM contacts WHERE phone_digits IS NULL OR email_lower IS NULL''')
+cur.executemany('''UPDATE contacts SET phone_digits=?, phone_digits_rev=?, email_lower=?, email_local=?, email_domain=? WHERE id=?''',
+                [(*normalize_phone(phone), *normalize_email(email), contact_id)
+                 for contact_id, phone, email in cur.fetchall()])
+cur.execute('''CREATE INDEX IF NOT EXISTS contacts_phone_digits ON contacts(phone_digits)''')
+cur.execute('''CREATE INDEX IF NOT EXISTS contacts_phone_digits_rev ON contacts(phone_digits_rev)''')
+cur.execute('''CREATE INDEX IF NOT EXISTS contacts_email_lower ON contacts(email_lower)''')
+cur.execute('''CREATE INDEX IF NOT EXISTS contacts_email_local ON contacts(email_local)''')
+cur.execute('''CREATE INDEX IF NOT EXISTS contacts_email_domain ON contacts(email_domain)''')
+con.commit()
+
+CONTACT_COLUMNS = 'id, first_name, last_name, phone, email'
+
+ARCHIVE_DIR = path.abspath(environ.get('ARCHIVE_DIR', 'archives'))
+
 pos = 0
 
 """" 
@@ -39,6 +122,12 @@ if it exceeds 10.0.
 the archived file.
 * `get(cls)`: Returns an instance of the Archiver class, creating a new one if none exists, 
 and runs the archiving process if an instance already exists.
+* `create_full(cls)`: Writes a full dump of `contacts` as a JSON archive and records it.
+* `create_delta(cls, since_id, since_time)`: Writes a JSON archive holding only the contacts 
+changed since a given archive id or timestamp, read from the `contact_changes` log.
+* `compact(cls)`: Merges the latest full archive and the deltas after it into a new full archive, 
+removing the files of the superseded archives.
+* `find(cls, archive_id)`: Returns the metadata of an archive whose file is still available.
 
 Note that the `user_id` parameter in the `__init__` method is not used anywhere in the class, 
 and the `archive_file` method always returns the same fixed string.
@@ -48,6 +137,10 @@ and the `archive_file` method always returns the same fixed string.
 class Archiver:
 
     instance = None
+    # archive methods run several statements in a row, so they get their own
+    # cursor and are serialized, away from the cursor shared by the routes
+    cursor = con.cursor()
+    lock = threading.RLock()
 
     def __init__(self, user_id):
         """
@@ -135,6 +228,181 @@ class Archiver:
             Archiver.run()
         return cls.instance
 
+    @classmethod
+    def last_change_id(cls):
+        """
+        Returns the id of the most recent entry in the contact change log.
+
+        Returns:
+            int: The last change id, or 0 if the log is empty.
+        """
+        cls.cursor.execute('''SELECT COALESCE(MAX(id), 0) FROM contact_changes''')
+        return cls.cursor.fetchone()[0]
+
+    @classmethod
+    def record(cls, kind, since_change, change_id, data):
+        """
+        Writes an archive to disk as JSON and records it in the archives table.
+
+        Args:
+            kind (str): Either 'full' or 'delta'.
+            since_change (int): The change id the archive starts after (0 for a full archive).
+            change_id (int): The last change id included in the archive.
+            data (dict): The archive content, without its metadata.
+
+        Returns:
+            dict: The archive metadata ('id', 'kind', 'since_change', 'change_id', 'path').
+        """
+        cls.cursor.execute('''INSERT INTO archives(kind, since_change, change_id) VALUES(?, ?, ?)''',
+                           (kind, since_change, change_id))
+        archive_id = cls.cursor.lastrowid
+        archive_path = path.join(ARCHIVE_DIR, f'{kind}-{archive_id}.json')
+        makedirs(ARCHIVE_DIR, exist_ok=True)
+        meta = {'id': archive_id, 'kind': kind, 'since_change': since_change,
+                'change_id': change_id}
+        with open(archive_path, 'w') as f:
+            json.dump({**meta, **data}, f)
+        meta['path'] = archive_path
+        cls.cursor.execute('''UPDATE archives SET path=? WHERE id=?''',
+                           (archive_path, archive_id))
+        con.commit()
+        return meta
+
+    @classmethod
+    def create_full(cls):
+        """
+        Creates a full archive containing every contact in the database.
+
+        Returns:
+            dict: The metadata of the new archive.
+        """
+        with cls.lock:
+            # read the log position first, so a concurrent change is repeated
+            # by the next delta instead of being lost
+            change_id = cls.last_change_id()
+            cls.cursor.execute('''SELECT id, first_name, last_name, phone, email FROM contacts''')
+            contacts = [Contact(*row).__dict__ for row in cls.cursor.fetchall()]
+            return cls.record('full', 0, change_id, {'contacts': contacts})
+
+    @classmethod
+    def create_delta(cls, since_id=None, since_time=None):
+        """
+        Creates a delta archive with the contacts changed since an archive or a timestamp.
+
+        Contacts changed in the window and still present are listed in 'upserts' with
+        their current data, removed contacts are listed by id in 'deletes'.
+
+        Args:
+            since_id (int, optional): The id of the archive the delta starts from.
+            since_time (datetime, optional): The time the delta starts from; naive values are taken as UTC.
+                Changes made in the same second are included again, as the log only keeps whole seconds.
+
+        Returns:
+            dict: The metadata of the new archive, or None if the base archive does not exist.
+        """
+        with cls.lock:
+            if since_id is not None:
+                cls.cursor.execute('''SELECT change_id FROM archives WHERE id=?''', (since_id,))
+                row = cls.cursor.fetchone()
+                if row is None:
+                    return None
+                since_change = row[0]
+            else:
+                if since_time.tzinfo is not None:
+                    since_time = since_time.astimezone(timezone.utc).replace(tzinfo=None)
+                # changed_at is stored in whole UTC seconds: repeat the boundary second rather than lose it
+                cls.cursor.execute('''SELECT COALESCE(MAX(id), 0) FROM contact_changes WHERE changed_at < ?''',
+                                   (since_time.strftime('%Y-%m-%d %H:%M:%S'),))
+                since_change = cls.cursor.fetchone()[0]
+            change_id = cls.last_change_id()
+            cls.cursor.execute('''SELECT ch.contact_id, c.id, c.first_name, c.last_name, c.phone, c.email
+                                  FROM (SELECT DISTINCT contact_id FROM contact_changes WHERE id > ? AND id <= ?) ch
+                                  LEFT JOIN contacts c ON c.id = ch.contact_id''',
+                               (since_change, change_id))
+            upserts = []
+            deletes = []
+            for row in cls.cursor.fetchall():
+                if row[1] is None:
+                    deletes.append(row[0])
+                else:
+                    upserts.append(Contact(*row[1:]).__dict__)
+            return cls.record('delta', since_change, change_id,
+                              {'upserts': upserts, 'deletes': deletes})
+
+    @classmethod
+    def compact(cls):
+        """
+        Merges the latest full archive and the deltas following it into a new full archive.
+
+        Deltas are applied in order as long as they start at or before the change id
+        reached so far. The files of the merged archives are then removed, but their rows
+        are kept so deltas can still be requested since them; the change log is kept too,
+        so deltas by timestamp still work. Without a full archive to start from, a full
+        snapshot is taken instead, as rows older than the change log are only found there.
+
+        Returns:
+            dict: The metadata of the new full archive, or of the latest full archive if
+            there is no delta to merge.
+        """
+        with cls.lock:
+            cls.cursor.execute('''SELECT id, change_id, path FROM archives WHERE kind='full' AND path IS NOT NULL
+                                  ORDER BY change_id DESC LIMIT 1''')
+            base = cls.cursor.fetchone()
+            if base is None:
+                return cls.create_full()
+            with open(base[2]) as f:
+                contacts = {c['id']: c for c in json.load(f)['contacts']}
+            change_id = base[1]
+            merged = [base]
+            while True:
+                cls.cursor.execute('''SELECT id, change_id, path FROM archives WHERE kind='delta' AND path IS NOT NULL
+                                      AND since_change <= ? AND change_id > ?
+                                      ORDER BY change_id DESC LIMIT 1''', (change_id, change_id))
+                delta = cls.cursor.fetchone()
+                if delta is None:
+                    break
+                with open(delta[2]) as f:
+                    data = json.load(f)
+                for contact_id in data['deletes']:
+                    contacts.pop(contact_id, None)
+                for contact in data['upserts']:
+                    contacts[contact['id']] = contact
+                change_id = delta[1]
+                merged.append(delta)
+            if len(merged) < 2:
+                return {'id': base[0], 'kind': 'full', 'since_change': 0,
+                        'change_id': base[1], 'path': base[2]}
+            meta = cls.record('full', 0, change_id,
+                              {'contacts': sorted(contacts.values(), key=lambda c: c['id'])})
+            cls.cursor.execute('''SELECT path FROM archives WHERE change_id <= ? AND id != ? AND path IS NOT NULL''',
+                               (change_id, meta['id']))
+            for (archive_path,) in cls.cursor.fetchall():
+                if path.exists(archive_path):
+                    remove(archive_path)
+            cls.cursor.execute('''UPDATE archives SET path=NULL WHERE change_id <= ? AND id != ?''',
+                               (change_id, meta['id']))
+            con.commit()
+            return meta
+
+    @classmethod
+    def find(cls, archive_id):
+        """
+        Retrieves the metadata of an archive whose file is still available.
+
+        Args:
+            archive_id (int): The id of the archive.
+
+        Returns:
+            dict: The archive metadata, or None if the archive does not exist or was compacted.
+        """
+        with cls.lock:
+            cls.cursor.execute('''SELECT id, kind, since_change, change_id, path FROM archives
+                                  WHERE id=? AND path IS NOT NULL''', (archive_id,))
+            row = cls.cursor.fetchone()
+            if row is None:
+                return None
+            return dict(zip(('id', 'kind', 'since_change', 'change_id', 'path'), row))
+
 
 """
 Here is a succinct explanation of the `Contact` class definition:
@@ -233,8 +501,11 @@ class Contact:
         Returns:
             bool: True if the contact was successfully created, False otherwise.
         """
-        cur.execute('''INSERT INTO contacts(first_name, last_name, phone, email) VALUES(?, ?, ?, ?)''',
-                    (contact.first, contact.last, contact.phone, contact.email))
+        cur.execute('''INSERT INTO contacts(first_name, last_name, phone, email,
+                       phone_digits, phone_digits_rev, email_lower, email_local, email_domain)
+                       VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                    (contact.first, contact.last, contact.phone, contact.email,
+                     *normalize_phone(contact.phone), *normalize_email(contact.email)))
         con.commit()
         return True
 
@@ -249,7 +520,7 @@ class Contact:
         Returns:
             Contact: The contact object retrieved from the database.
         """
-        cur.execute('''SELECT * FROM contacts WHERE id=?''', (contact_id,))
+        cur.execute(f'''SELECT {CONTACT_COLUMNS} FROM contacts WHERE id=?''', (contact_id,))
         return cls(*cur.fetchone())
 
     @classmethod
@@ -263,8 +534,11 @@ class Contact:
         Returns:
             bool: True if the contact was successfully updated, False otherwise.
         """
-        cur.execute('''UPDATE contacts SET first_name=?, last_name=?, phone=?, email=? WHERE id=?''',
-                    (contact.first, contact.last, contact.phone, contact.email, contact.id))
+        cur.execute('''UPDATE contacts SET first_name=?, last_name=?, phone=?, email=?,
+                       phone_digits=?, phone_digits_rev=?, email_lower=?, email_local=?, email_domain=?
+                       WHERE id=?''',
+                    (contact.first, contact.last, contact.phone, contact.email,
+                     *normalize_phone(contact.phone), *normalize_email(contact.email), contact.id))
         con.commit()
         return True
 
@@ -283,37 +557,79 @@ class Contact:
         con.commit()
 
     @classmethod
-    def all(cls, page=1):
+    def all(cls, page=1, after=None):
         """
         Retrieves all contacts from the database, paginated by a specified page number.
 
+        When `after` is given, the page holds the contacts following that contact id instead,
+        so pages stay correct after rows above them were deleted.
+
         Args:
             page (int, optional): The page number to retrieve. Defaults to 1.
+            after (int, optional): The id of the last contact already shown. Defaults to None.
 
         Returns:
             list: A list of Contact objects representing the contacts on the specified page.
         """
-        cur.execute('''SELECT * FROM contacts LIMIT 10 OFFSET ?''',
-                    ((page - 1) * 10,))
+        if after is not None:
+            cur.execute(f'''SELECT {CONTACT_COLUMNS} FROM contacts WHERE id > ? ORDER BY id LIMIT 10''',
+                        (after,))
+        else:
+            cur.execute(f'''SELECT {CONTACT_COLUMNS} FROM contacts ORDER BY id LIMIT 10 OFFSET ?''',
+                        ((page - 1) * 10,))
         return [cls(*row) for row in cur.fetchall()]
 
     @classmethod
-    def search(cls, search_term):
+    def search(cls, search_term, substring=False):
         """
         Searches for contacts in the database based on a given search term.
 
+        Phone-like terms (only digits and phone punctuation, at least 3 digits) match contacts
+        whose digits-only phone starts or ends with the term's digits, so "5551234" finds
+        "(555) 123-4". Terms containing '@' match by email: "john@" by local part prefix,
+        "@example" by domain prefix and "john@ex" by address prefix, ignoring case. These
+        are indexed lookups. Any other term is matched as a substring of the contacts' first
+        name, last name, phone, and email, which scans the table.
+
         Args:
             search_term (str): The term to search for in the contacts' first name, last name, phone, and email.
+            substring (bool, optional): Whether phone-like and email terms also get the substring
+                match, at the cost of a table scan. Defaults to False.
 
         Returns:
             list: A list of Contact objects representing the contacts that match the search term.
         """
-        cur.execute('''SELECT * FROM contacts WHERE first_name LIKE ?
-                        OR last_name LIKE ?
-                        OR phone LIKE ?
-                        OR email LIKE ?''',
-                    ('%' + search_term + '%',) * 4)
-        return [cls(*row) for row in cur.fetchall()]
+        term = search_term.strip()
+        digits, digits_rev = normalize_phone(term)
+        email_lower, local, domain = normalize_email(term)
+        rows = []
+        if len(digits) >= 3 and all(ch.isdigit() or ch in ' +-().' for ch in term):
+            cur.execute(f'''SELECT {CONTACT_COLUMNS} FROM contacts
+                            WHERE (phone_digits >= ? AND phone_digits < ?)
+                            OR (phone_digits_rev >= ? AND phone_digits_rev < ?)''',
+                        (*prefix_range(digits), *prefix_range(digits_rev)))
+            rows = cur.fetchall()
+        elif '@' in term and (local or domain):
+            if not domain:
+                column, prefix = 'email_local', local
+            elif not local:
+                column, prefix = 'email_domain', domain
+            else:
+                column, prefix = 'email_lower', email_lower
+            cur.execute(f'''SELECT {CONTACT_COLUMNS} FROM contacts WHERE {column} >= ? AND {column} < ?''',
+                        prefix_range(prefix))
+            rows = cur.fetchall()
+        else:
+            substring = True
+        if substring:
+            seen = {row[0] for row in rows}
+            cur.execute(f'''SELECT {CONTACT_COLUMNS} FROM contacts WHERE first_name LIKE ?
+                            OR last_name LIKE ?
+                            OR phone LIKE ?
+                            OR email LIKE ?''',
+                        ('%' + search_term + '%',) * 4)
+            rows += [row for row in cur.fetchall() if row[0] not in seen]
+        return [cls(*row) for row in rows]
 
     @classmethod
     def email_exists(cls, email):
@@ -330,18 +646,180 @@ class Contact:
         return cur.fetchone()[0] > 0
 
     @classmethod
-    def count(cls):
+    def count(cls, delay=True):
         """
         Returns the count of contacts in the database.
 
+        Args:
+            delay (bool, optional): Whether to add the demo delay. Defaults to True.
+
         Returns:
             int: The count of contacts in the database.
         """
         cur.execute('''SELECT COUNT(*) FROM contacts''')
-        time.sleep(1.5)  # Add a 1.5 second delay
+        if delay:
+            time.sleep(1.5)  # Add a 1.5 second delay
         return cur.fetchone()[0]
 
 
+"""
+Here is a succinct explanation of the `RouteLimiter` class definition:
+
+**Class RouteLimiter:**
+
+* Caps how many requests of a route (or a group of routes sharing a name) run at the same time, 
+so slow handlers can not hold every worker thread. Requests over the limit wait in a bounded 
+queue for a free slot; when the queue is full or the wait times out the request is shed.
+
+**Class Methods:**
+
+1. `__init__`: Initializes a limiter with its `name`, `max_active`, `max_queued`, `timeout` and 
+`retry_after` settings.
+2. `acquire`: Takes a slot, waiting in the queue if needed. Returns False when the request is shed.
+3. `release`: Frees a slot and wakes up a queued request.
+4. `stats`: Returns the active, queued, admitted and shed counters of the limiter.
+5. `get`: Returns the limiter registered under a name, creating it if none exists.
+
+The `limit` decorator wraps a view with a limiter. Shed requests get a 503 with a `Retry-After` 
+header, or, for htmx requests, the `fallback` template rendered as a lightweight fragment.
+"""
+
+
+class RouteLimiter:
+
+    limiters = {}
+
+    def __init__(self, name, max_active, max_queued, timeout, retry_after):
+        """
+        Initializes a new RouteLimiter.
+
+        Args:
+            name (str): The name the limiter is registered under.
+            max_active (int): The maximum number of requests handled at the same time.
+            max_queued (int): The maximum number of requests waiting for a slot.
+            timeout (float): The maximum number of seconds a request waits in the queue.
+            retry_after (int): The number of seconds sent back in the Retry-After header.
+
+        Returns:
+            None
+        """
+        self.name = name
+        self.max_active = max_active
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiters = deque()
+        self.admitted = 0
+        self.shed = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Takes a slot for the current request, waiting in the queue if all slots are busy.
+
+        Queued requests are admitted in arrival order: a new request waits behind them
+        even when a slot was just freed.
+
+        Returns:
+            bool: True if the request was admitted, False if it was shed.
+        """
+        with self.condition:
+            if self.active >= self.max_active or self.waiters:
+                if len(self.waiters) >= self.max_queued:
+                    self.shed += 1
+                    return False
+                waiter = object()
+                self.waiters.append(waiter)
+                admitted = self.condition.wait_for(
+                    lambda: self.waiters[0] is waiter and self.active < self.max_active, self.timeout)
+                self.waiters.remove(waiter)
+                # the next waiter may now be at the head of the queue
+                self.condition.notify_all()
+                if not admitted:
+                    self.shed += 1
+                    return False
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        """
+        Frees the slot taken by the current request and wakes up a queued request.
+
+        Returns:
+            None
+        """
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def stats(self):
+        """
+        Returns the counters of the limiter.
+
+        Returns:
+            dict: The limits, the current active and queued requests, and the admitted and shed totals.
+        """
+        with self.condition:
+            return {
+                'max_active': self.max_active,
+                'max_queued': self.max_queued,
+                'active': self.active,
+                'queued': len(self.waiters),
+                'admitted': self.admitted,
+                'shed': self.shed
+            }
+
+    @classmethod
+    def get(cls, name, max_active, max_queued=0, timeout=0.0, retry_after=1):
+        """
+        Retrieves the limiter registered under a name.
+
+        If no limiter exists for the name, it creates one with the given settings.
+        Otherwise, the existing limiter is returned and the settings are ignored.
+
+        Returns:
+            RouteLimiter: The limiter registered under the name.
+        """
+        if name not in cls.limiters:
+            cls.limiters[name] = RouteLimiter(
+                name, max_active, max_queued, timeout, retry_after)
+        return cls.limiters[name]
+
+
+def limit(name, max_active, max_queued=0, timeout=0.0, retry_after=1, fallback=None):
+    """
+    Decorates a view so it runs under the RouteLimiter registered as `name`.
+
+    Args:
+        name (str): The limiter name; views sharing a name share the same slots.
+        max_active (int): The maximum number of requests handled at the same time.
+        max_queued (int, optional): The maximum number of requests waiting for a slot. Defaults to 0.
+        timeout (float, optional): The maximum number of seconds a request waits in the queue. Defaults to 0.0.
+        retry_after (int, optional): The number of seconds sent back in the Retry-After header. Defaults to 1.
+        fallback (str, optional): A template rendered instead of the 503 for htmx requests.
+
+    Returns:
+        function: The decorator.
+    """
+    limiter = RouteLimiter.get(name, max_active, max_queued, timeout, retry_after)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not limiter.acquire():
+                if fallback and request.headers.get('HX-Request'):
+                    return render_template(fallback, retry_after=limiter.retry_after)
+                return "Server busy, try again later.", 503, {'Retry-After': str(limiter.retry_after)}
+            try:
+                return view(*args, **kwargs)
+            finally:
+                limiter.release()
+        return wrapper
+    return decorator
+
+
 @app.route("/")
 def index():
     """
@@ -354,6 +832,7 @@ def index():
 
 
 @app.route("/contacts")
+@limit("contacts", max_active=4, max_queued=8, timeout=2.0)
 def contacts():
     """
     Defines a route for the "/contacts" URL of the application.
@@ -365,19 +844,24 @@ def contacts():
 
     Args:
         q (str): The search term to search for in the contacts' first name, last name, phone, and email.
+        substring (str): When present, phone and email terms are also matched as substrings (a table scan).
         page (int): The page number to retrieve contacts for.
+        after (int): The id of the last contact already shown, used by the infinite scroll.
 
     Returns:
         render_template: A rendered HTML template ("index.html") with a list of contacts and the current page number.
     """
     search = request.args.get("q")
     page = int(request.args.get("page", 1))
+    after = request.args.get("after")
+    if after is not None and not after.isdigit():
+        return "Invalid 'after'.", 400
     if search is not None:
-        contacts_set = Contact.search(search)
+        contacts_set = Contact.search(search, substring="substring" in request.args)
         if request.headers.get('HX-Trigger') == 'search':
             return render_template("rows.html", contacts=contacts_set, page=page)
     else:
-        contacts_set = Contact.all(page)
+        contacts_set = Contact.all(page, after=int(after) if after is not None else None)
     return render_template("index.html", contacts=contacts_set, page=page, archiver=Archiver.get())
 
 
@@ -386,15 +870,18 @@ def contacts_delete_all():
     """
     Deletes multiple contacts from the database.
 
-    Retrieves a list of contact IDs from the request form, finds each contact by ID, 
-    and deletes them from the database. After deletion, it retrieves a list of all 
-    contacts and renders the "index.html" template with the updated list.
+    Retrieves a list of contact IDs from the request form and deletes them from the
+    database. For htmx requests it renders the "deleted.html" fragment, which removes
+    the deleted rows, updates the contact count and shows the flash message as
+    out-of-band swaps. Otherwise it renders the "index.html" template with the
+    updated list.
 
     Parameters:
         selected_contact_ids (list): A list of contact IDs to be deleted.
 
     Returns:
-        render_template: A rendered HTML template ("index.html") with a list of contacts.
+        render_template: A rendered HTML fragment ("deleted.html") for htmx requests,
+        or a rendered HTML template ("index.html") with a list of contacts.
     """
     # this dont worked
     # contact_ids = [
@@ -407,11 +894,12 @@ def contacts_delete_all():
         int(id) for id in request.args.getlist("selected_contact_ids")
     ]
     for contact_id in contact_ids:
-        contact = Contact.get(contact_id)
         Contact.delete(contact_id)
     flash("Deleted Contacts!")
+    if request.headers.get('HX-Request'):
+        return render_template("deleted.html", contact_ids=contact_ids, count=Contact.count(delay=False))
     contacts_set = Contact.all()
-    return render_template("index.html", contacts=contacts_set)
+    return render_template("index.html", contacts=contacts_set, page=1, archiver=Archiver.get())
 
 
 @app.route("/contacts/archive", methods=["GET"])
@@ -427,6 +915,7 @@ def archive_status():
 
 
 @app.route("/contacts/archive/file", methods=["GET"])
+@limit("archive", max_active=1, max_queued=2, timeout=5.0, retry_after=10)
 def archive_content():
     """
     Retrieves the archived contact data as a downloadable JSON file.
@@ -439,6 +928,84 @@ def archive_content():
         manager.archive_file(), "archive.json", as_attachment=True)
 
 
+@app.route("/contacts/archive/full", methods=["POST"])
+@limit("archive", max_active=1, max_queued=2, timeout=5.0, retry_after=10)
+def archive_full():
+    """
+    Creates a full archive of the contacts.
+
+    Returns:
+        dict: The metadata of the new archive, to download from "/contacts/archive/<archive_id>".
+    """
+    archive = Archiver.create_full()
+    return {k: v for k, v in archive.items() if k != 'path'}
+
+
+@app.route("/contacts/archive/delta", methods=["POST"])
+@limit("archive", max_active=1, max_queued=2, timeout=5.0, retry_after=10)
+def archive_delta():
+    """
+    Creates a delta archive with the contacts changed since an archive or a timestamp.
+
+    Parameters:
+        since (int): The id of the archive the delta starts from.
+        since_time (str): An ISO 8601 time the delta starts from (UTC unless it has an offset), used when 'since' is not given.
+
+    Returns:
+        dict: The metadata of the new archive, to download from "/contacts/archive/<archive_id>".
+        tuple: An error message and a 400 or 404 status code if the starting point is missing, invalid or unknown.
+    """
+    since = request.values.get("since")
+    since_time = request.values.get("since_time")
+    if since is None and since_time is None:
+        return "Missing 'since' or 'since_time'.", 400
+    if since is not None and not since.isdigit():
+        return "Invalid 'since'.", 400
+    if since is None:
+        try:
+            since_time = datetime.fromisoformat(since_time)
+        except ValueError:
+            return "Invalid 'since_time'.", 400
+    archive = Archiver.create_delta(
+        since_id=int(since) if since is not None else None, since_time=since_time)
+    if archive is None:
+        return "Unknown archive.", 404
+    return {k: v for k, v in archive.items() if k != 'path'}
+
+
+@app.route("/contacts/archive/<int:archive_id>", methods=["GET"])
+@limit("archive", max_active=1, max_queued=2, timeout=5.0, retry_after=10)
+def archive_download(archive_id):
+    """
+    Returns an existing archive as a downloadable JSON file.
+
+    Parameters:
+        archive_id (int): The id of the archive.
+
+    Returns:
+        send_file: A JSON file containing the archive.
+        tuple: An error message and a 404 status code if the archive does not exist or was compacted.
+    """
+    archive = Archiver.find(archive_id)
+    if archive is None:
+        return "Unknown archive.", 404
+    return send_file(archive['path'], as_attachment=True,
+                     download_name=f"archive-{archive['id']}.json")
+
+
+@app.route("/contacts/archive/compact", methods=["POST"])
+@limit("archive", max_active=1, max_queued=2, timeout=5.0, retry_after=10)
+def archive_compact():
+    """
+    Merges the latest full archive and its deltas into a new full archive.
+
+    Returns:
+        dict: The metadata of the resulting full archive.
+    """
+    archive = Archiver.compact()
+    return {k: v for k, v in archive.items() if k != 'path'}
+
+
 @app.route("/contacts/archive", methods=["DELETE"])
 def reset_archive():
     """
@@ -465,6 +1032,7 @@ def start_archive():
 
 
 @app.route("/contacts/count")
+@limit("count", max_active=2, max_queued=2, timeout=3.0, retry_after=3, fallback="busy.html")
 def contacts_count():
     """
     Defines a route for the "/contacts/count" URL of the application.
@@ -582,15 +1150,19 @@ def contacts_delete(contact_id=0):
         contact_id (int): The ID of the contact to be deleted. Defaults to 0.
 
     Returns:
-        redirect: A redirect response to the "/contacts" URL with a status code of 303.
+        render_template: A rendered HTML fragment ("deleted.html"). From the edit page
+        ("delete-btn") it replaces the editor with a link back to the contacts, pushes
+        "/contacts" as the URL and shows the flash message out-of-band; from a row it is
+        empty, removing the row, and updates the contact count out-of-band.
     """
     contact = Contact.get(contact_id)
     Contact.delete(contact.id)
     if request.headers.get('HX-Trigger') == 'delete-btn':
         flash("Deleted Contact!")
-        return redirect("/contacts", 303)
+        # move the browser off the edit URL of the deleted contact
+        return render_template("deleted.html", back=True), 200, {'HX-Push-Url': '/contacts'}
     else:
-        return ""
+        return render_template("deleted.html", count=Contact.count(delay=False))
 
 
 @app.route("/contacts/<contact_id>/email", methods=["GET"])
@@ -711,3 +1283,16 @@ def json_contacts_delete(contact_id=0):
     contact = Contact.get(contact_id)
     Contact.delete(contact.id)
     return jsonify({"success": True})
+
+
+@app.route("/api/v1/limits", methods=["GET"])
+def json_limits():
+    """
+    Defines a route for the "/api/v1/limits" URL of the application, handling GET requests.
+
+    Returns the counters of every route limiter, for monitoring queue depth and shed requests.
+
+    Returns:
+        dict: A dictionary of limiter counters keyed by limiter name.
+    """
+    return {name: limiter.stats() for name, limiter in RouteLimiter.limiters.items()}